@@ -3,27 +3,335 @@ HTTP request execution for Ping Robot
 
 This module handles the actual HTTP request execution:
 - Async HTTP requests using httpx
+- In-process DNS cache for repeat hostnames
 - Timeout handling (default 10 seconds)
 - Error classification (timeout, DNS, connection, 4xx, 5xx)
 - Metrics capture (status code, latency, response size)
 """
 
+import asyncio
+import socket
+import httpcore
 import httpx
 import time
-from typing import Dict, Any, Optional
+import urllib.request
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
 
 # Default timeout for HTTP requests (10 seconds)
 DEFAULT_TIMEOUT = 10.0
 
+# Connection pool limits for the shared client
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 50
+KEEPALIVE_EXPIRY = 300.0
+
+# DNS cache settings
+DNS_CACHE_TTL = 300.0
+DNS_CACHE_MAX_ENTRIES = 1024
+
+# Resolved addresses per hostname: host -> (IP addresses, expiry as time.monotonic())
+_dns_cache: Dict[str, Tuple[List[str], float]] = {}
+
+# Shared HTTP client for all requests (created in main.py's lifespan)
+# Why: Reusing one client keeps connections alive between pings, so repeat
+# requests to the same host skip the TCP+TLS handshake and DNS lookup
+_client: Optional[httpx.AsyncClient] = None
+
+# Prepared request arguments per target: target_id -> client.request kwargs
+_prepared: Dict[str, Dict[str, Any]] = {}
+
+# Validators from each target's last GET response: target_id -> conditional request headers
+# Why: Repeat GETs of "CONDITIONAL" probe_mode targets send If-None-Match/
+# If-Modified-Since, so an unchanged resource comes back as an empty 304
+# instead of the full body
+_validators: Dict[str, Dict[str, str]] = {}
+
+# Error type per HTTP status class (status_code // 100)
+_STATUS_ERROR_TYPES: Dict[int, str] = {4: "4xx", 5: "5xx"}
+
+# Error type per httpx exception class (see classify_error)
+# Why: One dict lookup per class in the exception's MRO replaces a chain of
+# isinstance checks; the MRO walk finds ConnectError before its NetworkError base
+_EXCEPTION_ERROR_TYPES: Dict[type, str] = {
+    httpx.TimeoutException: "timeout",
+    httpx.ConnectError: "connection",
+    httpx.NetworkError: "connection",
+}
+
+
+async def resolve_host(host: str, port: int) -> List[str]:
+    """
+    Resolve a hostname to IP addresses, using the in-process DNS cache.
+    
+    Args:
+        host: Hostname to resolve
+        port: Port the connection will use
+        
+    Returns:
+        List of IP addresses for the host
+        
+    Why: Targets are pinged every few seconds, so caching lookups for
+    DNS_CACHE_TTL seconds skips the resolver on nearly every attempt.
+    The blocking getaddrinfo call runs in a thread to keep the event loop free.
+    """
+    now = time.monotonic()
+    cached = _dns_cache.get(host)
+    if cached and cached[1] > now:
+        return cached[0]
+    
+    loop = asyncio.get_running_loop()
+    infos = await loop.run_in_executor(None, socket.getaddrinfo, host, port, 0, socket.SOCK_STREAM)
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    
+    # Keep the cache bounded by evicting the oldest entry
+    if host not in _dns_cache and len(_dns_cache) >= DNS_CACHE_MAX_ENTRIES:
+        _dns_cache.pop(next(iter(_dns_cache)))
+    _dns_cache[host] = (addresses, now + DNS_CACHE_TTL)
+    
+    return addresses
+
+
+class CachingDNSBackend(httpcore.AsyncNetworkBackend):
+    """
+    httpcore network backend that resolves hostnames through the DNS cache.
+    
+    Why: Connections are opened to the cached IP address; TLS still uses
+    the original hostname for SNI and certificate checks.
+    """
+    
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+    
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        # One deadline covers the lookup and every address tried
+        # Why: httpcore's connect timeout used to include DNS resolution, so a
+        # hanging resolver or several dead addresses mustn't stretch it
+        deadline = None if timeout is None else time.monotonic() + timeout
+        
+        try:
+            addresses = await asyncio.wait_for(resolve_host(host, port), timeout)
+        except asyncio.TimeoutError as e:
+            raise httpcore.ConnectTimeout(f"DNS lookup for {host} timed out") from e
+        except socket.gaierror as e:
+            raise httpcore.ConnectError(str(e)) from e
+        
+        # Try each address in turn, like getaddrinfo-based connects do
+        # (a ConnectTimeout isn't a ConnectError, so it ends the loop)
+        last_error = None
+        for address in addresses:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise httpcore.ConnectTimeout(f"Connecting to {host} timed out")
+            try:
+                return await self._backend.connect_tcp(
+                    address,
+                    port,
+                    timeout=remaining,
+                    local_address=local_address,
+                    socket_options=socket_options
+                )
+            except httpcore.ConnectError as e:
+                last_error = e
+        
+        # None of the addresses worked - drop them so the next attempt re-resolves
+        _dns_cache.pop(host, None)
+        raise last_error or httpcore.ConnectError(f"No addresses found for {host}")
+    
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+    
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+class CachingDNSTransport(httpx.AsyncHTTPTransport):
+    """
+    httpx transport whose connection pool uses CachingDNSBackend.
+    """
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # httpx doesn't expose network_backend, so set it on the pool directly
+        # (relies on httpx/httpcore internals - versions are pinned in requirements.txt)
+        self._pool._network_backend = CachingDNSBackend()
+
+
+def init_client() -> httpx.AsyncClient:
+    """
+    Create the shared HTTP client used by execute_request.
+    
+    Returns:
+        The shared httpx.AsyncClient
+        
+    Why: Called once on application startup so every ping draws from the
+    same keep-alive connection pool instead of opening a fresh connection.
+    """
+    global _client
+    if _client is None:
+        # HTTP/2 lets concurrent pings to the same host share one connection;
+        # servers that don't negotiate it via ALPN fall back to HTTP/1.1 automatically
+        limits = httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        )
+        
+        if has_env_proxy():
+            # httpx only applies HTTP_PROXY/HTTPS_PROXY/ALL_PROXY when no custom
+            # transport is given, and the proxy resolves hostnames itself anyway
+            _client = httpx.AsyncClient(
+                timeout=httpx.Timeout(DEFAULT_TIMEOUT),
+                http2=True,
+                limits=limits
+            )
+        else:
+            # Pool limits belong to the transport when a custom one is used
+            _client = httpx.AsyncClient(
+                timeout=httpx.Timeout(DEFAULT_TIMEOUT),
+                transport=CachingDNSTransport(http2=True, limits=limits)
+            )
+    return _client
+
+
+def has_env_proxy() -> bool:
+    """
+    Check whether a proxy is configured through the environment.
+    
+    Returns:
+        True if HTTP_PROXY, HTTPS_PROXY or ALL_PROXY (any case) is set
+    """
+    proxies = urllib.request.getproxies()
+    return any(proxies.get(scheme) for scheme in ("http", "https", "all"))
+
+
+async def close_client():
+    """
+    Close the shared HTTP client and release pooled connections.
+    
+    Why: Called on application shutdown so open sockets are closed cleanly.
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_request_kwargs(target: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get the httpx request arguments for a target, building them only once.
+    
+    Args:
+        target: Target dictionary with url, method, headers, body_template
+        
+    Returns:
+        Keyword arguments for client.request (method, url, headers, content)
+        
+    Why: A target's configuration doesn't change while it's scheduled, so
+    upper-casing the method and encoding the body on every ping is wasted work.
+    """
+    target_id = target.get("id")
+    prepared = _prepared.get(target_id)
+    if prepared is not None:
+        return prepared
+    
+    method = target.get("method", "GET").upper()
+    
+    # Liveness-only GET targets are probed with HEAD so no body is sent back
+    if method == "GET" and target.get("probe_mode") == "HEAD":
+        method = "HEAD"
+    
+    prepared = {
+        "method": method,
+        "url": target.get("url"),
+        "headers": target.get("headers") or {},
+    }
+    
+    # Add content/body for methods that support it
+    body_template = target.get("body_template")
+    if body_template and method in ["POST", "PUT", "PATCH"]:
+        prepared["content"] = body_template.encode('utf-8') if isinstance(body_template, str) else body_template
+    
+    if target_id is not None:
+        _prepared[target_id] = prepared
+    return prepared
+
+
+def invalidate_target(target_id: str):
+    """
+    Drop a target's prepared request arguments.
+    
+    Args:
+        target_id: ID of the target that was changed or removed
+        
+    Why: Must be called whenever a stored target is modified, so the next
+    ping rebuilds its request from the new configuration.
+    """
+    _prepared.pop(target_id, None)
+    _validators.pop(target_id, None)
+
+
+def get_validators(response: httpx.Response) -> Dict[str, str]:
+    """
+    Get the conditional request headers to send for a response's resource.
+    
+    Args:
+        response: Response to a target's GET request
+        
+    Returns:
+        If-None-Match/If-Modified-Since headers (empty if the response has neither)
+    """
+    validators = {}
+    etag = response.headers.get("etag")
+    if etag:
+        validators["If-None-Match"] = etag
+    last_modified = response.headers.get("last-modified")
+    if last_modified:
+        validators["If-Modified-Since"] = last_modified
+    return validators
+
+
+async def send_request(
+    client: httpx.AsyncClient,
+    request_kwargs: Dict[str, Any],
+    timeout: float
+) -> Tuple[httpx.Response, int]:
+    """
+    Send a request and read its response body, counting the bytes received.
+    
+    Args:
+        client: Shared HTTP client
+        request_kwargs: Keyword arguments for client.stream (see get_request_kwargs)
+        timeout: Request timeout in seconds
+        
+    Returns:
+        Tuple of (response, response size in bytes)
+        
+    Why: Only the length is needed, so the body is never buffered into one
+    bytes object; reading it to the end still lets the connection go back
+    to the keep-alive pool. HEAD responses have no body, so their size is
+    taken from the Content-Length header.
+    """
+    # Timeout is passed per request since the client is shared
+    async with client.stream(**request_kwargs, timeout=timeout) as response:
+        response_size = 0
+        async for chunk in response.aiter_raw():
+            response_size += len(chunk)
+    
+    if request_kwargs["method"] == "HEAD":
+        content_length = response.headers.get("content-length", "")
+        response_size = int(content_length) if content_length.isdigit() else 0
+    
+    return response, response_size
+
 
 async def execute_request(target: Dict[str, Any], timeout: float = DEFAULT_TIMEOUT) -> Dict[str, Any]:
     """
     Execute an HTTP request for a target.
     
     Args:
-        target: Target dictionary with url, method, headers, body_template
+        target: Target dictionary with url, method, headers, body_template, probe_mode
         timeout: Request timeout in seconds (default: 10.0)
         
     Returns:
@@ -37,21 +345,10 @@ async def execute_request(target: Dict[str, Any], timeout: float = DEFAULT_TIMEO
     Why: Centralized HTTP execution with comprehensive error handling and metrics collection.
     Uses httpx for async HTTP requests with proper timeout and error classification.
     """
-    # Record start time for latency calculation
-    start_time = time.time()
+    # Record start time for latency calculation (monotonic clock for elapsed time)
+    start_time = time.perf_counter()
     timestamp = datetime.now()
     
-    # Extract target configuration
-    url = target.get("url")
-    method = target.get("method", "GET").upper()
-    headers = target.get("headers") or {}
-    body_template = target.get("body_template")
-    
-    # Prepare request body if provided
-    content = None
-    if body_template and method in ["POST", "PUT", "PATCH"]:
-        content = body_template.encode('utf-8') if isinstance(body_template, str) else body_template
-    
     # Initialize attempt result with defaults
     attempt = {
         "timestamp": timestamp.isoformat(),
@@ -62,88 +359,63 @@ async def execute_request(target: Dict[str, Any], timeout: float = DEFAULT_TIMEO
     }
     
     try:
-        # Create httpx client with timeout
-        # Why: Using context manager ensures proper cleanup of connections
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            # Prepare request kwargs
-            request_kwargs = {
-                "method": method,
-                "url": url,
-                "headers": headers,
-            }
-            
-            # Add content/body for methods that support it
-            if content:
-                request_kwargs["content"] = content
-            
-            # Execute the HTTP request
-            response = await client.request(**request_kwargs)
-            
-            # Calculate latency
-            latency_ms = (time.time() - start_time) * 1000
-            
-            # Get response size
-            response_size = len(response.content) if response.content else 0
-            
-            # Classify response status
-            status_code = response.status_code
-            
-            # Classify 4xx and 5xx as errors
-            if 400 <= status_code < 500:
-                error_type = "4xx"
-            elif 500 <= status_code < 600:
-                error_type = "5xx"
-            else:
-                error_type = None
-            
-            # Build attempt result
-            attempt.update({
-                "status_code": status_code,
-                "latency_ms": round(latency_ms, 2),
-                "response_size": response_size,
-                "error_type": error_type
-            })
-            
-    except httpx.TimeoutException:
-        # Request timed out
-        latency_ms = (time.time() - start_time) * 1000
-        attempt.update({
-            "latency_ms": round(latency_ms, 2),
-            "error_type": "timeout"
-        })
+        # Use the shared client (created lazily if the app lifespan didn't)
+        client = _client or init_client()
         
-    except httpx.ConnectError:
-        # Connection error (server unreachable, connection refused, etc.)
-        latency_ms = (time.time() - start_time) * 1000
-        attempt.update({
-            "latency_ms": round(latency_ms, 2),
-            "error_type": "connection"
-        })
+        # Request arguments are prepared once per target
+        request_kwargs = get_request_kwargs(target)
         
-    except httpx.NetworkError as e:
-        # Network-related errors (DNS, network unreachable, etc.)
-        latency_ms = (time.time() - start_time) * 1000
+        # Make repeat GETs conditional on the last response's validators
+        # (only for targets that opt in, since a 304 is recorded with no body;
+        # headers set on the target itself take precedence)
+        target_id = target.get("id")
+        conditional = target.get("probe_mode") == "CONDITIONAL"
+        validators = _validators.get(target_id) if conditional else None
+        if validators:
+            request_kwargs = {**request_kwargs, "headers": {**validators, **request_kwargs["headers"]}}
         
-        # Check if it's a DNS error
-        error_str = str(e).lower()
-        if "name resolution" in error_str or "dns" in error_str or "name or service not known" in error_str:
-            error_type = "DNS"
-        else:
-            error_type = "connection"
+        # Execute the HTTP request, streaming the body
+        response, response_size = await send_request(client, request_kwargs, timeout)
         
+        # Fall back to GET for servers that don't allow HEAD, and keep using GET for this target
+        if response.status_code == 405 and request_kwargs["method"] == "HEAD":
+            request_kwargs = {**request_kwargs, "method": "GET"}
+            if target_id is not None:
+                _prepared[target_id] = request_kwargs
+            response, response_size = await send_request(client, request_kwargs, timeout)
+        
+        # Calculate latency
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        
+        # Remember validators for the next GET; a 304 may omit them, so keep the old ones
+        if conditional and request_kwargs["method"] == "GET" and target_id is not None:
+            new_validators = get_validators(response)
+            if new_validators:
+                _validators[target_id] = new_validators
+            elif response.status_code != 304:
+                _validators.pop(target_id, None)
+        
+        # Classify response status (4xx and 5xx are errors; 304 Not Modified is a success)
+        status_code = response.status_code
+        
+        # Build attempt result
         attempt.update({
+            "status_code": status_code,
             "latency_ms": round(latency_ms, 2),
-            "error_type": error_type
+            "response_size": response_size,
+            "error_type": classify_error(status_code)
         })
         
     except Exception as e:
-        # Catch any other unexpected errors
-        latency_ms = (time.time() - start_time) * 1000
+        # Timeout, DNS, connection, or any other unexpected error
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        error_type = classify_error(None, e)
         attempt.update({
             "latency_ms": round(latency_ms, 2),
-            "error_type": "unknown",
-            "error_message": str(e)
+            "error_type": error_type or "unknown"
         })
+        if error_type is None:
+            attempt["error_message"] = str(e)
     
     return attempt
 
@@ -160,22 +432,48 @@ def classify_error(status_code: Optional[int], exception: Optional[Exception] =
         Error type string or None if no error
         
     Why: Centralized error classification logic for consistent error reporting.
+    Exceptions are matched by walking their class hierarchy against
+    _EXCEPTION_ERROR_TYPES, so the most specific httpx exception wins.
     """
     if status_code:
-        if 400 <= status_code < 500:
-            return "4xx"
-        elif 500 <= status_code < 600:
-            return "5xx"
+        error_type = _STATUS_ERROR_TYPES.get(status_code // 100)
+        if error_type is not None:
+            return error_type
     
     if exception:
-        if isinstance(exception, httpx.TimeoutException):
-            return "timeout"
-        elif isinstance(exception, httpx.ConnectError):
-            return "connection"
-        elif isinstance(exception, httpx.NetworkError):
-            error_str = str(exception).lower()
-            if "dns" in error_str or "name resolution" in error_str:
-                return "DNS"
-            return "connection"
-    
-    return None
\ No newline at end of file
+        for exc_type in type(exception).__mro__:
+            error_type = _EXCEPTION_ERROR_TYPES.get(exc_type)
+            if error_type is not None:
+                break
+        else:
+            return None
+        
+        # A failed hostname lookup surfaces as a ConnectError caused by socket.gaierror
+        if error_type == "connection" and is_dns_error(exception):
+            return "DNS"
+        return error_type
+    
+    return None
+
+
+def is_dns_error(exception: BaseException) -> bool:
+    """
+    Check whether an exception was caused by a failed hostname lookup.
+    
+    Args:
+        exception: Exception raised while sending the request
+        
+    Returns:
+        True if socket.gaierror is anywhere in the exception's cause chain
+        
+    Why: httpx wraps the resolver error in httpcore and httpx ConnectErrors,
+    so the original socket.gaierror is found by following __cause__.
+    """
+    seen = set()
+    cause = exception
+    while cause is not None and id(cause) not in seen:
+        if isinstance(cause, socket.gaierror):
+            return True
+        seen.add(id(cause))
+        cause = cause.__cause__ or cause.__context__
+    return False
@@ -13,16 +13,18 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import asyncio
 import uuid
+from collections import Counter
 from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import Optional, List
 
 # Import scheduler function (will be implemented in scheduler.py)
-from scheduler import run_scheduler
+from scheduler import run_scheduler, notify_schedules_changed
 
 # Import models and storage functions
 from models import Target, Schedule, Run, TargetCreate, ScheduleCreate, ScheduleStatus
 import storage
+import executor
 
 
 @asynccontextmanager
@@ -31,12 +33,15 @@ async def lifespan(app: FastAPI):
     Lifespan context manager for FastAPI application lifecycle.
     
     This handles:
-    - Starting the background scheduler task on application startup
-    - Gracefully canceling the scheduler task on application shutdown
+    - Creating the shared HTTP client and starting the background scheduler task on application startup
+    - Gracefully canceling the scheduler task, closing the HTTP client and flushing pending saves on application shutdown
     
     Why: FastAPI's lifespan events ensure the scheduler runs for the entire
     application lifetime and is properly cleaned up when the server stops.
     """
+    # Create the shared HTTP client used for all scheduled requests
+    executor.init_client()
+    
     # Start scheduler on startup
     # Create a background task that runs the scheduler loop
     scheduler_task = asyncio.create_task(run_scheduler())
@@ -53,6 +58,12 @@ async def lifespan(app: FastAPI):
     except asyncio.CancelledError:
         # Expected exception when task is cancelled - this is normal
         pass
+    
+    # Close pooled connections after the scheduler has stopped
+    await executor.close_client()
+    
+    # Write any target/schedule saves still waiting for the background flusher
+    storage.flush_all()
 
 
 # Initialize FastAPI app with metadata and lifespan
@@ -124,26 +135,20 @@ async def create_target(target_data: TargetCreate):
     # Generate unique ID for the target
     target_id = str(uuid.uuid4())
     
-    # Create target object
-    target = Target(
-        id=target_id,
-        url=target_data.url,
-        method=target_data.method,
-        headers=target_data.headers,
-        body_template=target_data.body_template
-    )
+    # Build the stored target directly from the validated request data
+    # Why: TargetCreate is already validated, so building a Target model
+    # and dumping it back to a dict would only repeat that work
+    target_dict = {"id": target_id, **target_data.model_dump()}
     
-    # Load existing targets
+    # Load existing targets and add the new one
     targets = storage.load_targets()
-    
-    # Convert target to dict and add to list
-    target_dict = target.model_dump()
     targets.append(target_dict)
     
     # Save targets back to file
     storage.save_targets(targets)
     
-    return target
+    # Return the target without re-validating it
+    return Target.model_construct(**target_dict)
 
 
 @app.post("/schedules", response_model=Schedule)
@@ -176,28 +181,32 @@ async def create_schedule(schedule_data: ScheduleCreate):
     created_at = datetime.now()
     ends_at = created_at + timedelta(seconds=schedule_data.duration_seconds)
     
-    # Create schedule object
-    schedule = Schedule(
-        id=schedule_id,
-        target_id=schedule_data.target_id,
-        interval_seconds=schedule_data.interval_seconds,
-        duration_seconds=schedule_data.duration_seconds,
-        status=ScheduleStatus.ACTIVE,
-        created_at=created_at,
-        ends_at=ends_at
-    )
+    # Build the stored schedule directly from the validated request data
+    # (same fields as the Schedule model, without a validate/dump round trip)
+    # Timestamps are stored as ISO strings, the same form they have after a reload
+    schedule_dict = {
+        "id": schedule_id,
+        "target_id": schedule_data.target_id,
+        "interval_seconds": schedule_data.interval_seconds,
+        "duration_seconds": schedule_data.duration_seconds,
+        "status": ScheduleStatus.ACTIVE,
+        "created_at": created_at.isoformat(),
+        "ends_at": ends_at.isoformat()
+    }
     
-    # Load existing schedules
+    # Load existing schedules and add the new one
     schedules = storage.load_schedules()
-    
-    # Convert schedule to dict and add to list
-    schedule_dict = schedule.model_dump()
     schedules.append(schedule_dict)
     
     # Save schedules back to file
     storage.save_schedules(schedules)
     
-    return schedule
+    # Let the scheduler pick up the change without waiting for its next deadline
+    notify_schedules_changed()
+    
+    # Return the stored dict; FastAPI converts it to the Schedule response model
+    # (model_construct would leave the ISO strings in datetime fields)
+    return schedule_dict
 
 
 @app.post("/schedules/{schedule_id}/pause")
@@ -235,6 +244,9 @@ async def pause_schedule(schedule_id: str):
     # Save schedules back to file
     storage.save_schedules(schedules)
     
+    # Let the scheduler pick up the change without waiting for its next deadline
+    notify_schedules_changed()
+    
     # Return updated schedule
     return schedules[schedule_index]
 
@@ -242,8 +254,8 @@ async def pause_schedule(schedule_id: str):
 @app.get("/runs")
 async def get_runs(
     schedule_id: Optional[str] = Query(None, description="Filter by schedule ID"),
-    limit: Optional[int] = Query(None, description="Limit number of results"),
-    offset: Optional[int] = Query(0, description="Offset for pagination")
+    limit: Optional[int] = Query(None, ge=0, description="Limit number of results"),
+    offset: Optional[int] = Query(0, ge=0, description="Offset for pagination")
 ):
     """
     Get run history with optional filtering.
@@ -258,17 +270,17 @@ async def get_runs(
         
     Why: Allows users to view execution history and track request attempts
     """
-    # Load all runs
-    runs = storage.load_runs()
-    
-    # Filter by schedule_id if provided
-    if schedule_id:
-        runs = [r for r in runs if r.get("schedule_id") == schedule_id]
+    # Load all runs, or only the schedule's runs if schedule_id is provided
+    runs = storage.load_runs_by_schedule(schedule_id or None)
     
     # Apply pagination
-    if offset:
+    # Why: One slice copies only the requested page, instead of first
+    # copying every run after the offset and then slicing that copy
+    if offset and limit:
+        runs = runs[offset:offset + limit]
+    elif offset:
         runs = runs[offset:]
-    if limit:
+    elif limit:
         runs = runs[:limit]
     
     return {
@@ -297,47 +309,23 @@ async def get_metrics(
         
     Why: Provides insights into request performance and success rates
     """
-    # Load all runs
-    runs = storage.load_runs()
-    
-    # Filter by schedule_id if provided
-    if schedule_id:
-        runs = [r for r in runs if r.get("schedule_id") == schedule_id]
-    
-    # Aggregate metrics
-    total_attempts = 0
-    successful_attempts = 0
-    failed_attempts = 0
-    total_latency = 0.0
-    status_codes = {}
-    error_types = {}
-    
-    # Process all attempts from all runs
-    for run in runs:
-        attempts = run.get("attempts", [])
-        total_attempts += len(attempts)
-        
-        for attempt in attempts:
-            # Check if successful (has status_code and no error)
-            if attempt.get("status_code") and not attempt.get("error_type"):
-                successful_attempts += 1
-            else:
-                failed_attempts += 1
-            
-            # Aggregate latency
-            latency = attempt.get("latency_ms", 0)
-            if latency:
-                total_latency += latency
-            
-            # Count status codes
-            status_code = attempt.get("status_code")
-            if status_code:
-                status_codes[status_code] = status_codes.get(status_code, 0) + 1
-            
-            # Count error types
-            error_type = attempt.get("error_type")
-            if error_type:
-                error_types[error_type] = error_types.get(error_type, 0) + 1
+    # Load all runs, or only the schedule's runs if schedule_id is provided
+    runs = storage.load_runs_by_schedule(schedule_id or None)
+    
+    # Flatten all attempts from all runs into one list
+    attempts = [attempt for run in runs for attempt in run.get("attempts", [])]
+    total_attempts = len(attempts)
+    
+    # Aggregate metrics (successful = has status_code and no error)
+    # Why: Counter and sum() do the counting in C instead of one Python
+    # dict update per attempt, which matters for long run histories
+    successful_attempts = sum(1 for a in attempts if a.get("status_code") and not a.get("error_type"))
+    failed_attempts = total_attempts - successful_attempts
+    total_latency = sum(a.get("latency_ms") or 0 for a in attempts)
+    
+    # Count status codes and error types
+    status_codes = Counter(filter(None, (a.get("status_code") for a in attempts)))
+    error_types = Counter(filter(None, (a.get("error_type") for a in attempts)))
     
     # Calculate average latency
     avg_latency = total_latency / total_attempts if total_attempts > 0 else 0.0
@@ -348,8 +336,8 @@ async def get_metrics(
         "failed_attempts": failed_attempts,
         "success_rate": (successful_attempts / total_attempts * 100) if total_attempts > 0 else 0.0,
         "average_latency_ms": round(avg_latency, 2),
-        "status_code_distribution": status_codes,
-        "error_type_distribution": error_types
+        "status_code_distribution": dict(status_codes),
+        "error_type_distribution": dict(error_types)
     }
 
 
@@ -362,12 +350,16 @@ if __name__ == "__main__":
     - host: 0.0.0.0 (listen on all interfaces)
     - port: 8000 (default FastAPI port)
     - reload: True (auto-reload on code changes for development)
+    - loop: auto (uvloop when installed, otherwise the default asyncio loop)
     
-    Why: Allows running the app directly with 'python main.py'
+    Why: Allows running the app directly with 'python main.py'.
+    uvloop's libuv-based loop has lower per-task overhead, which benefits
+    both the scheduler and the concurrent httpx requests.
     """
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True
+        reload=True,
+        loop="auto"
     )
@@ -8,8 +8,8 @@ This module defines the data models used throughout the application:
 - Attempt: Individual HTTP request attempt with metrics
 """
 
-from pydantic import BaseModel, HttpUrl
-from typing import Optional, Dict, List
+from pydantic import BaseModel, Field, HttpUrl
+from typing import Optional, Dict, List, Literal
 from datetime import datetime
 from enum import Enum
 
@@ -30,12 +30,15 @@ class Target(BaseModel):
     - method: HTTP method (GET, POST, etc.)
     - headers: Optional HTTP headers as key-value pairs
     - body_template: Optional request body template
+    - probe_mode: "HEAD" pings GET targets with HEAD (liveness only, no body);
+      "CONDITIONAL" sends repeat GETs with If-None-Match/If-Modified-Since
     """
     id: Optional[str] = None
     url: str
     method: str = "GET"
     headers: Optional[Dict[str, str]] = None
     body_template: Optional[str] = None
+    probe_mode: Literal["GET", "HEAD", "CONDITIONAL"] = "GET"
 
 
 class Schedule(BaseModel):
@@ -104,10 +107,11 @@ class TargetCreate(BaseModel):
     method: str = "GET"
     headers: Optional[Dict[str, str]] = None
     body_template: Optional[str] = None
+    probe_mode: Literal["GET", "HEAD", "CONDITIONAL"] = "GET"
 
 
 class ScheduleCreate(BaseModel):
     """Request model for creating a schedule"""
     target_id: str
-    interval_seconds: int
+    interval_seconds: int = Field(gt=0)
     duration_seconds: int
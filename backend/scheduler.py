@@ -9,9 +9,11 @@ This module handles the background scheduling logic that:
 """
 
 import asyncio
+import math
+import time
 import uuid
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set
 
 # Import storage functions
 import storage
@@ -23,6 +25,71 @@ from models import Schedule, ScheduleStatus, Run, Attempt
 from executor import execute_request
 
 
+# Start time of the last attempt per schedule: schedule_id -> time.monotonic()
+# Why: Lets should_run_now answer with one dict lookup and a subtraction
+# instead of scanning run history and parsing timestamps every tick
+_last_run: Dict[str, float] = {}
+
+# Parsed end time per schedule: schedule_id -> epoch seconds (see get_ends_at_ts)
+_ends_at_ts: Dict[str, Optional[float]] = {}
+
+# Maximum number of schedule executions running at once
+# Why: Bounds concurrency if executions pile up (matches the HTTP connection pool size)
+MAX_CONCURRENT_EXECUTIONS = 100
+_execution_slots: Optional[asyncio.Semaphore] = None
+
+# Schedules with an execution currently in flight
+# Why: A slow target shouldn't get a second execution queued every tick
+_in_flight: Set[str] = set()
+
+# Longest the scheduler sleeps when no schedule is due sooner
+MAX_IDLE_SECONDS = 60.0
+
+# Shortest interval a schedule runs at
+# Why: Finished executions wake the scheduler at once, so a stored interval
+# of 0 (or less) would otherwise re-run its schedule back to back
+MIN_INTERVAL_SECONDS = 1.0
+
+# Set when schedules are created or paused, or an execution finishes
+# Why: Wakes the scheduler early so it can recompute its next deadline
+# (this and _execution_slots are created by run_scheduler, on its own event
+# loop, so the app can be started again on a new loop in the same process)
+_schedules_changed: Optional[asyncio.Event] = None
+
+
+def get_ends_at_ts(schedule: Dict[str, Any]) -> Optional[float]:
+    """
+    Get a schedule's end time as an epoch timestamp, parsing it only once.
+    
+    Args:
+        schedule: Schedule dictionary
+        
+    Returns:
+        End time as epoch seconds, math.inf if the schedule has no window,
+        or None if ends_at can't be parsed
+        
+    Why: ends_at never changes for a schedule, so parsing the ISO string
+    once turns the per-tick window check into a float comparison.
+    """
+    schedule_id = schedule.get("id")
+    if schedule_id in _ends_at_ts:
+        return _ends_at_ts[schedule_id]
+    
+    ends_at = schedule.get("ends_at")
+    if not ends_at:
+        ends_at_ts = math.inf
+    else:
+        try:
+            if isinstance(ends_at, str):
+                ends_at = datetime.fromisoformat(ends_at.replace('Z', '+00:00'))
+            ends_at_ts = ends_at.timestamp()
+        except (ValueError, AttributeError):
+            ends_at_ts = None
+    
+    _ends_at_ts[schedule_id] = ends_at_ts
+    return ends_at_ts
+
+
 def load_active_schedules() -> List[Dict[str, Any]]:
     """
     Load all active schedules that are within their execution window.
@@ -43,14 +110,13 @@ def load_active_schedules() -> List[Dict[str, Any]]:
     # Load all schedules from schedules.json (step 4 of algorithm)
     all_schedules = storage.load_schedules()
     active_schedules = []
-    now = datetime.now()
+    now = time.time()
     
     # Track if we need to update schedules (for auto-pausing expired ones)
     schedules_updated = False
     
     for schedule in all_schedules:
         status = schedule.get("status", "active")
-        ends_at_str = schedule.get("ends_at")
         
         # Skip paused schedules (pause/resume handled via status field - step 6)
         if status == ScheduleStatus.PAUSED:
@@ -58,28 +124,24 @@ def load_active_schedules() -> List[Dict[str, Any]]:
         
         # Algorithm check: current_time < created_at + duration_seconds
         # We use ends_at which is calculated as created_at + duration_seconds
-        if ends_at_str:
-            # Parse ends_at if it's a string
-            if isinstance(ends_at_str, str):
-                try:
-                    ends_at = datetime.fromisoformat(ends_at_str.replace('Z', '+00:00'))
-                except (ValueError, AttributeError):
-                    # If parsing fails, skip this schedule
-                    continue
-            else:
-                ends_at = ends_at_str
-            
-            # Check: current_time < created_at + duration_seconds (i.e., now < ends_at)
-            # If past the duration window, auto-pause the schedule
-            if now >= ends_at:
-                schedule["status"] = ScheduleStatus.PAUSED
-                schedules_updated = True
-                continue
+        ends_at_ts = get_ends_at_ts(schedule)
+        if ends_at_ts is None:
+            # If parsing failed, skip this schedule
+            continue
+        
+        # Check: current_time < created_at + duration_seconds (i.e., now < ends_at)
+        # If past the duration window, auto-pause the schedule
+        if now >= ends_at_ts:
+            schedule["status"] = ScheduleStatus.PAUSED
+            schedules_updated = True
+            continue
         
         # Schedule is active and within window
         active_schedules.append(schedule)
     
-    # Save updated schedules if any were auto-paused
+    # Save updated schedules if any were auto-paused (once for all of them)
+    # Why: save_schedules only queues the write; storage's flusher thread
+    # serializes and writes the file, so it doesn't block in-flight requests
     if schedules_updated:
         storage.save_schedules(all_schedules)
     
@@ -101,53 +163,82 @@ def should_run_now(schedule: Dict[str, Any]) -> bool:
     Why: Determines if enough time has passed since the last execution
     to trigger a new execution based on interval_seconds.
     
-    Note: We track last_run_at via the most recent attempt timestamp in runs.json,
-    which is functionally equivalent to tracking it in the schedule itself.
+    Note: last_run_at is kept in memory in _last_run (monotonic seconds),
+    set by execute_schedule to the start time of each completed attempt. After a restart every
+    schedule runs once immediately, then resumes its interval.
     """
-    schedule_id = schedule.get("id")
-    interval_seconds = schedule.get("interval_seconds", 60)
-    
-    # Load all runs to find the most recent one for this schedule
-    runs = storage.load_runs()
-    
-    # Find the most recent run for this schedule
-    schedule_runs = [r for r in runs if r.get("schedule_id") == schedule_id]
-    
-    if not schedule_runs:
-        # No runs yet, should run immediately
+    last_run_at = _last_run.get(schedule.get("id"))
+    if last_run_at is None:
+        # No attempts yet in this process, should run immediately
         return True
     
-    # Get the most recent run
-    most_recent_run = max(schedule_runs, key=lambda r: r.get("started_at", ""))
-    
-    # Get the most recent attempt from this run
-    attempts = most_recent_run.get("attempts", [])
-    if not attempts:
-        # Run exists but no attempts yet, should run
-        return True
+    # Algorithm check: current_time >= last_run_at + interval_seconds
+    return (time.monotonic() - last_run_at) >= get_interval(schedule)
+
+
+def get_interval(schedule: Dict[str, Any]) -> float:
+    """
+    Get a schedule's interval in seconds, at least MIN_INTERVAL_SECONDS.
+    """
+    return max(schedule.get("interval_seconds", 60), MIN_INTERVAL_SECONDS)
+
+
+def seconds_until_next_run(schedules: List[Dict[str, Any]]) -> float:
+    """
+    Get how long the scheduler can sleep before something is due.
     
-    # Get the most recent attempt timestamp (this is our last_run_at)
-    most_recent_attempt = max(attempts, key=lambda a: a.get("timestamp", ""))
-    last_attempt_time_str = most_recent_attempt.get("timestamp")
+    Args:
+        schedules: Active schedules from load_active_schedules
+        
+    Returns:
+        Seconds until the earliest interval or window end, capped at MAX_IDLE_SECONDS
+        
+    Why: Sleeping until the next deadline instead of polling every second
+    avoids idle wake-ups. Schedules with an execution in flight are skipped;
+    the scheduler is woken when they finish.
+    """
+    now = time.time()
+    now_monotonic = time.monotonic()
+    delay = MAX_IDLE_SECONDS
     
-    if not last_attempt_time_str:
-        return True
+    for schedule in schedules:
+        # Wake at the window end so the schedule is auto-paused on time
+        delay = min(delay, get_ends_at_ts(schedule) - now)
+        
+        if schedule.get("id") in _in_flight:
+            continue
+        
+        last_run_at = _last_run.get(schedule.get("id"))
+        if last_run_at is None:
+            return 0.0
+        delay = min(delay, last_run_at + get_interval(schedule) - now_monotonic)
     
-    # Parse timestamp
-    try:
-        if isinstance(last_attempt_time_str, str):
-            last_attempt_time = datetime.fromisoformat(last_attempt_time_str.replace('Z', '+00:00'))
-        else:
-            last_attempt_time = last_attempt_time_str
-    except (ValueError, AttributeError):
-        # If parsing fails, run it
-        return True
+    return max(delay, 0.0)
+
+
+def notify_schedules_changed():
+    """
+    Wake the scheduler so it re-checks schedules immediately.
     
-    # Algorithm check: current_time >= last_run_at + interval_seconds
-    now = datetime.now()
-    time_since_last = (now - last_attempt_time).total_seconds()
+    Why: Called by the API after creating or pausing a schedule, since the
+    scheduler may otherwise be sleeping until a later deadline.
+    """
+    # (nothing to wake if the scheduler hasn't started yet)
+    if _schedules_changed is not None:
+        _schedules_changed.set()
+
+
+async def wait_for_next_run(timeout: float):
+    """
+    Sleep until the timeout expires or the scheduler is notified of a change.
     
-    return time_since_last >= interval_seconds
+    Args:
+        timeout: Maximum number of seconds to sleep
+    """
+    try:
+        await asyncio.wait_for(_schedules_changed.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
 
 
 async def execute_schedule(schedule: Dict[str, Any]):
@@ -162,7 +253,7 @@ async def execute_schedule(schedule: Dict[str, Any]):
     2. Creates or updates a run record
     3. Executes the HTTP request
     4. Saves the attempt to the run
-    5. Updates the run in storage
+    5. Appends the attempt to the attempts log in storage
     """
     schedule_id = schedule.get("id")
     target_id = schedule.get("target_id")
@@ -175,11 +266,8 @@ async def execute_schedule(schedule: Dict[str, Any]):
         # Target not found, skip execution
         return
     
-    # Load runs to find or create a run for this schedule
-    runs = storage.load_runs()
-    
     # Find the most recent run for this schedule that is still "running"
-    schedule_runs = [r for r in runs if r.get("schedule_id") == schedule_id]
+    schedule_runs = storage.load_runs_by_schedule(schedule_id)
     current_run = None
     
     for run in schedule_runs:
@@ -197,10 +285,12 @@ async def execute_schedule(schedule: Dict[str, Any]):
             "status": "running",
             "attempts": []
         }
-        runs.append(current_run)
-        storage.save_runs(runs)
+        # Log just the new run (one queued line rather than rewriting every run)
+        storage.append_run(current_run)
     
     # Execute the HTTP request
+    # (attempt start time is what the interval is measured from)
+    attempt_started = time.monotonic()
     attempt_result = await execute_request(target)
     
     # Ensure timestamp is set
@@ -208,16 +298,46 @@ async def execute_schedule(schedule: Dict[str, Any]):
         attempt_result["timestamp"] = datetime.now().isoformat()
     
     # Add attempt to current run
+    # (current_run is the same dict held in the stored runs list)
     current_run["attempts"].append(attempt_result)
+    _last_run[schedule_id] = attempt_started
     
-    # Update the run in the runs list
-    for i, r in enumerate(runs):
-        if r.get("id") == current_run.get("id"):
-            runs[i] = current_run
-            break
+    # Log the attempt (one appended line rather than rewriting every run)
+    # Why: This only queues the encoded line; storage's log writer thread
+    # does the file write, so disk I/O doesn't stall other schedules'
+    # in-flight requests on the event loop
+    storage.append_attempt(current_run["id"], schedule_id, attempt_result)
+
+
+async def run_supervised(schedule: Dict[str, Any]):
+    """
+    Run execute_schedule within the concurrency limit, logging any failure.
     
-    # Save updated runs
-    storage.save_runs(runs)
+    Args:
+        schedule: Schedule dictionary to execute
+        
+    Why: Tasks run inside the scheduler's TaskGroup, where an unhandled
+    exception would cancel every other in-flight execution. Errors are
+    logged here instead so one failing schedule doesn't affect the rest.
+    """
+    schedule_id = schedule.get("id")
+    dispatched_at = time.monotonic()
+    try:
+        async with _execution_slots:
+            await execute_schedule(schedule)
+    except Exception as e:
+        # In production, you'd want proper logging here
+        print(f"Schedule {schedule_id} execution error: {e}")
+    finally:
+        # Count the dispatch as a run even if no attempt was made
+        # Why: A schedule whose target is missing (or that raised before its
+        # attempt) would otherwise still be due and be re-dispatched at once
+        if _last_run.get(schedule_id, -math.inf) < dispatched_at:
+            _last_run[schedule_id] = dispatched_at
+        # (the scheduler added it to _in_flight when it created this task)
+        _in_flight.discard(schedule_id)
+        # Wake the scheduler so it can plan this schedule's next run
+        notify_schedules_changed()
 
 
 async def run_scheduler():
@@ -228,7 +348,7 @@ async def run_scheduler():
     1. ✅ Initialize data/ folder with empty JSON files (done at startup)
     2. ✅ Start FastAPI server (done in main.py)
     3. ✅ Start background scheduler task (done in main.py lifespan)
-    4. Scheduler reads schedules.json every second
+    4. Scheduler reads schedules.json whenever a schedule is due or changes
     5. For each active schedule:
        - Check: current_time >= last_run_at + interval_seconds
        - Check: current_time < created_at + duration_seconds (if window set)
@@ -238,27 +358,45 @@ async def run_scheduler():
     Why: Runs as a background task to continuously monitor and execute
     scheduled HTTP requests without blocking the FastAPI application.
     """
-    while True:
-        try:
-            # Step 4: Read schedules.json every second
-            # Load all active schedules (filters out paused and expired)
-            schedules = load_active_schedules()
-            
-            # Step 5: For each active schedule, check if it should run
-            for schedule in schedules:
-                # Check: current_time >= last_run_at + interval_seconds
-                if should_run_now(schedule):
-                    # If both checks pass (interval + duration), execute request
-                    # Create background task to execute schedule
-                    # This allows multiple schedules to run concurrently
-                    asyncio.create_task(execute_schedule(schedule))
-            
-            # Sleep for 1 second before checking again (step 4)
-            # Why: Prevents CPU spinning while still being responsive to schedule changes
-            await asyncio.sleep(1)
-            
-        except Exception as e:
-            # Log error but continue running
-            # In production, you'd want proper logging here
-            print(f"Scheduler error: {e}")
-            await asyncio.sleep(1)
+    global _schedules_changed, _execution_slots
+    _schedules_changed = asyncio.Event()
+    _execution_slots = asyncio.Semaphore(MAX_CONCURRENT_EXECUTIONS)
+    # Executions from a previous run were cancelled with its TaskGroup
+    _in_flight.clear()
+    
+    # All executions run in one TaskGroup for the scheduler's lifetime
+    # Why: Cancelling the scheduler (app shutdown) also cancels and awaits
+    # every in-flight execution instead of leaving orphaned tasks behind
+    async with asyncio.TaskGroup() as tg:
+        while True:
+            try:
+                # Clear before checking so changes made from here on wake the next sleep
+                _schedules_changed.clear()
+                
+                # Step 4: Read schedules.json
+                # Load all active schedules (filters out paused and expired)
+                schedules = load_active_schedules()
+                
+                # Step 5: For each active schedule, check if it should run
+                for schedule in schedules:
+                    # Skip schedules whose previous execution hasn't finished
+                    if schedule.get("id") in _in_flight:
+                        continue
+                    
+                    # Check: current_time >= last_run_at + interval_seconds
+                    if should_run_now(schedule):
+                        # If both checks pass (interval + duration), execute request
+                        # Create a task in the group so multiple schedules run concurrently
+                        _in_flight.add(schedule.get("id"))
+                        tg.create_task(run_supervised(schedule))
+                
+                # Sleep until the next schedule is due (step 4)
+                # Why: Prevents CPU spinning; create/pause and finished
+                # executions wake the loop early via _schedules_changed
+                await wait_for_next_run(seconds_until_next_run(schedules))
+                
+            except Exception as e:
+                # Log error but continue running
+                # In production, you'd want proper logging here
+                print(f"Scheduler error: {e}")
+                await asyncio.sleep(1)
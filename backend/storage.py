@@ -2,18 +2,31 @@
 File-based storage operations for Ping Robot
 
 This module handles all file I/O operations with thread-safe locking:
-- Reading and writing JSON files
-- Thread-safe file operations using filelock
+- Reading and writing JSON files (encoded and decoded with orjson)
+- Thread-safe file operations (per-file thread locks; filelock when several processes share the data)
+- In-memory cache of each file so repeated reads skip disk
+- Append-only runs/attempts log so each new run or ping writes one line instead of all runs
+- Write-behind saves for targets and schedules, coalescing bursts into one write
 - Data persistence for targets, schedules, and runs
 """
 
-import json
+import atexit
+import mmap
 import os
+import threading
+import time
+import orjson
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from filelock import FileLock
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows - filelock is used there instead
+    fcntl = None
+
 
 # Base directory for data files
 DATA_DIR = Path(__file__).parent / "data"
@@ -23,11 +36,167 @@ TARGETS_FILE = DATA_DIR / "targets.json"
 SCHEDULES_FILE = DATA_DIR / "schedules.json"
 RUNS_FILE = DATA_DIR / "runs.json"
 
+# Runs and attempts appended since runs.json was last written, one JSON object per line
+ATTEMPTS_FILE = DATA_DIR / "attempts.jsonl"
+
 # Lock files for thread-safe operations
 TARGETS_LOCK = DATA_DIR / "targets.json.lock"
 SCHEDULES_LOCK = DATA_DIR / "schedules.json.lock"
 RUNS_LOCK = DATA_DIR / "runs.json.lock"
 
+# Use OS-level file locks only when several processes share the data directory
+# Why: A single server process only needs thread locks, which skip the
+# lock-file open and flock syscalls on every load and save
+MULTIPROCESS = bool(os.environ.get("PINGROBOT_MULTIPROC"))
+
+# Indent the JSON data files only when PINGROBOT_PRETTY_JSON is set (for debugging)
+# Why: Compact output is roughly half the bytes to encode and write
+JSON_OPTIONS = orjson.OPT_INDENT_2 if os.environ.get("PINGROBOT_PRETTY_JSON") else 0
+
+# Lock per lock file path (see get_lock)
+_thread_locks: Dict[Path, Any] = {}
+_thread_locks_guard = threading.Lock()
+
+# In-memory copy of each data file, keyed by file path
+# Why: The scheduler reads schedules, targets and runs every second; serving
+# those reads from memory avoids re-parsing the JSON files on every tick.
+# Loads return the cached list itself, so callers that modify it must save it back.
+_cache: Dict[Path, List[Dict[str, Any]]] = {}
+
+# (st_mtime_ns, st_size) of each file when this process last read or wrote it
+# Why: With PINGROBOT_MULTIPROC set, another process may rewrite a file;
+# a changed stat means the cached copy is stale and must be re-read
+_file_stats: Dict[Path, Optional[Tuple[int, int]]] = {}
+
+# Index of the cached runs by schedule_id (see load_runs_by_schedule)
+# Why: The scheduler and the /runs and /metrics endpoints look up one
+# schedule's runs; a dict lookup avoids filtering the whole run history
+_runs_by_schedule: Dict[Optional[str], List[Dict[str, Any]]] = {}
+_indexed_runs: Optional[List[Dict[str, Any]]] = None
+_indexed_count = 0
+
+# Files at least this large are parsed from a memory map (see read_json_file)
+MMAP_MIN_SIZE = 64 * 1024
+
+# Seconds save_data waits before writing, so further saves can be coalesced
+FLUSH_INTERVAL = 0.25
+
+# Saves waiting to be written: file path -> (lock path, data, durable)
+# Why: Bursts of target/schedule updates (e.g. many schedules auto-pausing
+# in one tick) become one file rewrite instead of one per update
+_pending: Dict[Path, Tuple[Path, List[Dict[str, Any]], bool]] = {}
+_pending_cond = threading.Condition()
+_flush_lock = threading.Lock()
+_flusher: Optional[threading.Thread] = None
+
+# Seconds the log writer waits before appending, so queued lines share one write
+LOG_FLUSH_INTERVAL = 0.1
+
+# Size at which attempts.jsonl is folded into runs.json (see compact_runs)
+LOG_COMPACT_SIZE = 8 * 1024 * 1024
+
+# Encoded lines waiting to be appended to attempts.jsonl (see append_log_record)
+_log_buffer: List[bytes] = []
+_log_cond = threading.Condition()
+_log_writer: Optional[threading.Thread] = None
+
+# attempts.jsonl opened for appending, kept open by flush_log
+_log_file = None
+
+
+class FlockLock:
+    """
+    Process-shared lock using fcntl.flock on a lock file that is kept open.
+    
+    Why: One flock call blocks in the kernel until the lock is free, where
+    FileLock opens the lock file on every acquire and polls with timeouts.
+    flock doesn't exclude threads sharing the descriptor, so a thread lock
+    is held as well; like RLock, the same thread may acquire it again.
+    """
+    
+    def __init__(self, lock_path: Path):
+        self._lock_path = lock_path
+        self._thread_lock = threading.RLock()
+        self._fd: Optional[int] = None
+        self._depth = 0
+    
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0:
+                if self._fd is None:
+                    ensure_data_dir()
+                    self._fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            self._depth += 1
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        try:
+            if self._depth == 0:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            self._thread_lock.release()
+
+
+def get_lock(lock_path: Path):
+    """
+    Get the lock that guards a data file.
+    
+    Args:
+        lock_path: Path to the file's lock file
+        
+    Returns:
+        If PINGROBOT_MULTIPROC is set, a FlockLock (or a FileLock where
+        fcntl is unavailable); otherwise a process-local RLock
+    """
+    # One lock object per path, so nested acquires re-enter it
+    # (FileLock is only re-entrant through the same instance)
+    lock = _thread_locks.get(lock_path)
+    if lock is None:
+        with _thread_locks_guard:
+            lock = _thread_locks.get(lock_path)
+            if lock is None:
+                if not MULTIPROCESS:
+                    lock = threading.RLock()
+                elif fcntl is not None:
+                    lock = FlockLock(lock_path)
+                else:
+                    lock = FileLock(lock_path)
+                _thread_locks[lock_path] = lock
+    return lock
+
+
+def get_file_stat(file_path: Path) -> Optional[Tuple[int, int]]:
+    """
+    Get a file's modification time and size, or None if it doesn't exist.
+    """
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def is_cache_stale(file_path: Path) -> bool:
+    """
+    Check whether a file was changed by another process since it was cached.
+    
+    Args:
+        file_path: Path to the data file
+        
+    Returns:
+        True if PINGROBOT_MULTIPROC is set and the file's stat has changed
+        
+    Why: A single process is the only writer, so its cache is always current
+    and the os.stat call is skipped entirely.
+    """
+    return MULTIPROCESS and get_file_stat(file_path) != _file_stats.get(file_path)
+
 
 def ensure_data_dir():
     """
@@ -40,7 +209,11 @@ def ensure_data_dir():
 
 def load_data(file_path: Path, lock_path: Path) -> List[Dict[str, Any]]:
     """
-    Load data from a JSON file with thread-safe locking.
+    Load data from a JSON file, taking the lock only if it changes mid-read.
+    
+    The file is only read once; later calls return the in-memory copy,
+    which save_data keeps up to date. With PINGROBOT_MULTIPROC set, the
+    file is re-read if another process has changed it.
     
     Args:
         file_path: Path to the JSON file
@@ -52,47 +225,221 @@ def load_data(file_path: Path, lock_path: Path) -> List[Dict[str, Any]]:
     Why: Thread-safe reading ensures no data corruption when multiple requests
     access the same file simultaneously
     """
+    # Serve from memory if this file was already loaded or saved (and is unchanged)
+    cached = _cache.get(file_path)
+    if cached is not None and not is_cache_stale(file_path):
+        return cached
+    
     ensure_data_dir()
     
-    # If file doesn't exist, return empty list
+    # If file doesn't exist, start with an empty list
     if not file_path.exists():
-        return []
+        return _cache.setdefault(file_path, [])
     
-    # Use file lock to ensure thread-safe reading
-    with FileLock(lock_path):
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # Ensure we return a list
-                return data if isinstance(data, list) else []
-        except (json.JSONDecodeError, IOError):
-            # If file is corrupted or can't be read, return empty list
-            return []
+    # Optimistic read without the lock: writers swap in a new file with
+    # os.replace, so an unchanged stat on both sides means a complete read
+    stat = get_file_stat(file_path)
+    try:
+        data = read_json_file(file_path)
+    except (orjson.JSONDecodeError, IOError):
+        data = None
+    
+    if data is None or stat is None or get_file_stat(file_path) != stat:
+        # The file changed mid-read - read it again under the lock
+        with get_lock(lock_path):
+            try:
+                data = read_json_file(file_path)
+            except (orjson.JSONDecodeError, IOError):
+                # If file is corrupted or can't be read, return empty list
+                data = []
+            stat = get_file_stat(file_path)
+    
+    # Ensure we return a list
+    if not isinstance(data, list):
+        data = []
+    _file_stats[file_path] = stat
+    
+    if cached is not None:
+        # Another process changed the file - replace the stale copy
+        _cache[file_path] = data
+        return data
+    
+    return _cache.setdefault(file_path, data)
+
+
+def read_json_file(file_path: Path) -> Any:
+    """
+    Parse a JSON file (load_data re-checks its stat if reading unlocked).
+    
+    Args:
+        file_path: Path to the JSON file
+        
+    Returns:
+        The parsed JSON value
+        
+    Why: Files of MMAP_MIN_SIZE or more are memory-mapped and parsed straight
+    from the page cache, avoiding a second full-size copy of the file in
+    memory; smaller files are cheaper to read in one call. Either way the
+    file is read once front to back, so the kernel is told to read ahead.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_MIN_SIZE:
+            return orjson.loads(f.read())
+        
+        fadvise(f.fileno(), "POSIX_FADV_SEQUENTIAL")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            # The view must be released before the map can be closed
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+def fadvise(fd: int, advice: str):
+    """
+    Give the kernel a hint about how a file will be accessed, where supported.
+    
+    Args:
+        fd: Open file descriptor
+        advice: Name of the os.POSIX_FADV_* constant to apply to the whole file
+    """
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, getattr(os, advice))
 
 
-def save_data(file_path: Path, lock_path: Path, data: List[Dict[str, Any]]):
+def save_data(file_path: Path, lock_path: Path, data: List[Dict[str, Any]], durable: bool = True):
     """
-    Save data to a JSON file with thread-safe locking.
+    Save data to a JSON file with thread-safe locking (write-behind).
     
     Args:
         file_path: Path to the JSON file
         lock_path: Path to the lock file
         data: List of dictionaries to save
+        durable: fsync the file before it replaces the old one (see write_json_file)
         
-    Why: Thread-safe writing prevents data corruption when multiple requests
-    try to write simultaneously. The lock ensures only one write happens at a time.
+    Why: The in-memory copy is updated immediately, so every later load sees
+    the new data. The file is written by a background thread after
+    FLUSH_INTERVAL, so several saves in quick succession cost one write.
+    Thread-safe writing prevents data corruption when multiple requests
+    try to write simultaneously. Call flush_all() to write pending saves now.
     """
-    ensure_data_dir()
+    global _flusher
+    
+    _cache[file_path] = data
     
-    # Use file lock to ensure thread-safe writing
-    with FileLock(lock_path):
-        # Write to a temporary file first, then rename (atomic operation)
-        temp_file = file_path.with_suffix('.tmp')
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, default=str)
+    with _pending_cond:
+        _pending[file_path] = (lock_path, data, durable)
+        if _flusher is None:
+            _flusher = threading.Thread(target=flush_loop, name="storage-flusher", daemon=True)
+            _flusher.start()
+        _pending_cond.notify()
+
+
+def flush_loop():
+    """
+    Background thread that writes pending saves every FLUSH_INTERVAL seconds.
+    """
+    while True:
+        with _pending_cond:
+            while not _pending:
+                _pending_cond.wait()
+        
+        # Give further saves a moment to replace the pending data
+        time.sleep(FLUSH_INTERVAL)
         
-        # Atomic rename - ensures data integrity
-        temp_file.replace(file_path)
+        try:
+            flush_all()
+        except Exception as e:
+            # In production, you'd want proper logging here
+            print(f"Storage flush error: {e}")
+
+
+def flush_all():
+    """
+    Write all pending saves and queued log lines to disk now.
+    
+    Why: Registered with atexit (and called on app shutdown) so saves and
+    log lines that are still waiting for the background threads aren't lost.
+    """
+    flush_log()
+    close_log()
+    
+    # Only one flush at a time, so an older snapshot can't overwrite a newer one
+    with _flush_lock:
+        with _pending_cond:
+            pending = list(_pending.items())
+            _pending.clear()
+        
+        if not pending:
+            return
+        
+        ensure_data_dir()
+        
+        for file_path, (lock_path, data, durable) in pending:
+            # Use file lock to ensure thread-safe writing
+            with get_lock(lock_path):
+                write_json_file(file_path, data, durable)
+
+
+atexit.register(flush_all)
+
+
+def write_json_file(file_path: Path, data: List[Dict[str, Any]], durable: bool = True):
+    """
+    Write data to a JSON file atomically (caller must hold the file's lock).
+    
+    Args:
+        file_path: Path to the JSON file
+        data: List of dictionaries to save
+        durable: fsync the new file before renaming it into place, and the
+            directory after
+        
+    Why: The rename alone guarantees readers see either the old or the new
+    file. fsync also guarantees the new data survives a power loss, but
+    stalls on disk latency, so it is skipped for non-critical files.
+    Once fsynced, the file's pages are dropped from the page cache: this
+    process serves reads from memory and won't read the file back.
+    """
+    # Write to a temporary file first, then rename (atomic operation)
+    temp_file = file_path.with_suffix('.tmp')
+    with open(temp_file, 'wb') as f:
+        f.write(orjson.dumps(data, option=JSON_OPTIONS, default=str))
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+            # (only clean pages can be dropped, so this must follow the fsync)
+            fadvise(f.fileno(), "POSIX_FADV_DONTNEED")
+    
+    # Atomic rename - ensures data integrity
+    os.replace(temp_file, file_path)
+    
+    # fsync the directory too, so the rename itself survives a crash
+    if durable:
+        fsync_dir(file_path.parent)
+    
+    # This process's own write shouldn't make its cache look stale
+    _file_stats[file_path] = get_file_stat(file_path)
+
+
+def fsync_dir(dir_path: Path):
+    """
+    Flush a directory's entries (e.g. a rename into it) to disk.
+    
+    Args:
+        dir_path: Directory to fsync
+        
+    Why: fsync on a file doesn't persist its directory entry; without this
+    a crash right after the rename can bring back the old file. Skipped on
+    platforms that can't open directories (Windows).
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    
+    fd = os.open(dir_path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
 
 def load_targets() -> List[Dict[str, Any]]:
@@ -111,8 +458,11 @@ def save_targets(targets: List[Dict[str, Any]]):
     
     Args:
         targets: List of target dictionaries to save
+        
+    Why: Not fsynced - targets are small user configuration that is cheap
+    to recreate, so the write shouldn't wait on the disk.
     """
-    save_data(TARGETS_FILE, TARGETS_LOCK, targets)
+    save_data(TARGETS_FILE, TARGETS_LOCK, targets, durable=False)
 
 
 def load_schedules() -> List[Dict[str, Any]]:
@@ -131,18 +481,122 @@ def save_schedules(schedules: List[Dict[str, Any]]):
     
     Args:
         schedules: List of schedule dictionaries to save
+        
+    Why: Not fsynced, like targets; only the run history is written durably.
     """
-    save_data(SCHEDULES_FILE, SCHEDULES_LOCK, schedules)
+    save_data(SCHEDULES_FILE, SCHEDULES_LOCK, schedules, durable=False)
 
 
 def load_runs() -> List[Dict[str, Any]]:
     """
-    Load all runs from runs.json.
+    Load all runs from runs.json plus any runs and attempts logged in attempts.jsonl.
     
     Returns:
         List of run dictionaries
+        
+    Why: New runs and attempts are appended to attempts.jsonl as they
+    happen; they are replayed into the runs the first time runs are loaded.
+    """
+    cached = _cache.get(RUNS_FILE)
+    if cached is not None and not is_cache_stale(RUNS_FILE):
+        return cached
+    
+    # Write queued lines first so the replay sees them
+    flush_log()
+    runs = load_data(RUNS_FILE, RUNS_LOCK)
+    replay_attempts(runs)
+    return runs
+
+
+def load_runs_by_schedule(schedule_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Load the runs for one schedule from the runs index.
+    
+    Args:
+        schedule_id: ID of the schedule, or None for all runs
+        
+    Returns:
+        List of run dictionaries for the schedule (oldest first)
+        
+    Why: load_runs() returns the in-memory runs list and runs are only ever
+    appended to it, so the index only indexes new runs when the list grows
+    and is rebuilt when the list is replaced. The returned list belongs to
+    the index and must not be modified.
     """
-    return load_data(RUNS_FILE, RUNS_LOCK)
+    global _indexed_runs, _indexed_count
+    
+    runs = load_runs()
+    if schedule_id is None:
+        return runs
+    
+    if runs is not _indexed_runs or len(runs) < _indexed_count:
+        _runs_by_schedule.clear()
+        _indexed_runs = runs
+        _indexed_count = 0
+    
+    for run in runs[_indexed_count:]:
+        _runs_by_schedule.setdefault(run.get("schedule_id"), []).append(run)
+    _indexed_count = len(runs)
+    
+    return _runs_by_schedule.get(schedule_id, [])
+
+
+def replay_attempts(runs: List[Dict[str, Any]]):
+    """
+    Add the runs and attempts logged in attempts.jsonl to the runs list.
+    
+    Args:
+        runs: List of run dictionaries loaded from runs.json (updated in place)
+    """
+    if not ATTEMPTS_FILE.exists():
+        return
+    
+    runs_by_id = {r.get("id"): r for r in runs}
+    
+    # Attempt timestamps already present per run
+    # Why: Writes run in worker threads, so runs.json can be written with an
+    # attempt that is logged to attempts.jsonl just after it was cleared
+    seen: Dict[str, set] = {}
+    
+    with get_lock(RUNS_LOCK):
+        with open(ATTEMPTS_FILE, 'rb') as f:
+            for line in f:
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    # Skip a partially written line (e.g. after a crash)
+                    continue
+                
+                # A new run logged by append_run (skip it if runs.json already has it)
+                if "run" in record:
+                    run = record["run"]
+                    if run.get("id") not in runs_by_id:
+                        runs.append(run)
+                        runs_by_id[run.get("id")] = run
+                    continue
+                
+                attempt = record.get("attempt") or {}
+                run = runs_by_id.get(record.get("run_id"))
+                if run is None:
+                    # The run itself was never saved - rebuild it from the attempt
+                    run = {
+                        "id": record.get("run_id"),
+                        "schedule_id": record.get("schedule_id"),
+                        "started_at": attempt.get("timestamp"),
+                        "status": "running",
+                        "attempts": []
+                    }
+                    runs.append(run)
+                    runs_by_id[run["id"]] = run
+                
+                attempts = run.setdefault("attempts", [])
+                if run["id"] not in seen:
+                    seen[run["id"]] = {a.get("timestamp") for a in attempts}
+                if attempt.get("timestamp") in seen[run["id"]]:
+                    continue
+                
+                attempts.append(attempt)
+                seen[run["id"]].add(attempt.get("timestamp"))
 
 
 def save_runs(runs: List[Dict[str, Any]]):
@@ -151,20 +605,159 @@ def save_runs(runs: List[Dict[str, Any]]):
     
     Args:
         runs: List of run dictionaries to save
+        
+    Why: runs.json then holds every attempt, so attempts.jsonl (and any
+    lines still queued for it) is cleared under the same lock to avoid
+    replaying attempts twice.
     """
-    save_data(RUNS_FILE, RUNS_LOCK, runs)
+    ensure_data_dir()
+    
+    with get_lock(RUNS_LOCK):
+        # Copy the list as the queued lines are dropped (see append_run)
+        with _log_cond:
+            _log_buffer.clear()
+            snapshot = list(runs)
+        write_json_file(RUNS_FILE, snapshot)
+        _cache[RUNS_FILE] = runs
+        if ATTEMPTS_FILE.exists():
+            open(ATTEMPTS_FILE, 'w').close()
+
+
+def append_attempt(run_id: str, schedule_id: str, attempt: Dict[str, Any]):
+    """
+    Queue one attempt to be appended to attempts.jsonl (thread-safe).
+    
+    Args:
+        run_id: ID of the run the attempt belongs to
+        schedule_id: ID of the run's schedule
+        attempt: Attempt dictionary to log
+        
+    Why: Writing one line per attempt keeps the cost of each ping constant,
+    instead of rewriting the whole run history. The caller is expected to
+    have added the attempt to the in-memory run already.
+    """
+    append_log_record({"run_id": run_id, "schedule_id": schedule_id, "attempt": attempt})
 
 
 def append_run(run: Dict[str, Any]):
     """
-    Append a new run to runs.json (thread-safe).
+    Append a new run to the in-memory runs and queue it for attempts.jsonl (thread-safe).
     
     Args:
         run: Run dictionary to append
         
-    Why: Optimized function for appending runs without loading all data first.
-    However, for simplicity and consistency, we'll load, append, and save.
+    Why: Writing one line per new run keeps its cost constant, instead of
+    loading and rewriting the whole run history. The run is replayed into
+    runs.json's list on the next load, like logged attempts.
     """
     runs = load_runs()
-    runs.append(run)
-    save_runs(runs)
+    
+    # Append and queue under the log buffer's lock, not the runs file lock
+    # Why: save_runs copies the list while dropping queued lines under this
+    # lock, so the run is either in runs.json or its line is still queued.
+    # The file lock is held for a whole compaction and this runs on the
+    # event loop.
+    with _log_cond:
+        runs.append(run)
+        append_log_record({"run": run})
+
+
+def append_log_record(record: Dict[str, Any]):
+    """
+    Encode a record and queue it for the log writer thread.
+    
+    Args:
+        record: Run or attempt record to append to attempts.jsonl
+        
+    Why: Callers only pay for encoding one line; the log writer thread
+    appends everything queued in the last LOG_FLUSH_INTERVAL with a single
+    write(), so a burst of pings costs one open and write instead of one each.
+    """
+    global _log_writer
+    
+    line = orjson.dumps(record, default=str) + b"\n"
+    
+    with _log_cond:
+        _log_buffer.append(line)
+        if _log_writer is None:
+            _log_writer = threading.Thread(target=log_writer_loop, name="storage-log-writer", daemon=True)
+            _log_writer.start()
+        _log_cond.notify()
+
+
+def log_writer_loop():
+    """
+    Background thread that appends queued log lines every LOG_FLUSH_INTERVAL seconds.
+    """
+    while True:
+        with _log_cond:
+            while not _log_buffer:
+                _log_cond.wait()
+        
+        # Let more lines queue up so they share one write
+        time.sleep(LOG_FLUSH_INTERVAL)
+        
+        try:
+            log_size = flush_log()
+            if log_size >= LOG_COMPACT_SIZE:
+                compact_runs()
+        except Exception as e:
+            # In production, you'd want proper logging here
+            print(f"Storage log write error: {e}")
+
+
+def flush_log() -> int:
+    """
+    Append all queued log lines to attempts.jsonl now.
+    
+    Returns:
+        Size of attempts.jsonl in bytes after the write (0 if nothing was queued)
+        
+    Why: The log is opened once in append mode and kept open, so each batch
+    costs one write() and fsync. O_APPEND writes always land at the current
+    end of the file, so the handle stays valid when save_runs truncates it.
+    """
+    global _log_file
+    
+    with get_lock(RUNS_LOCK):
+        # Take the lines under the runs lock so save_runs can't clear the
+        # log between them being taken and written
+        with _log_cond:
+            lines = _log_buffer[:]
+            _log_buffer.clear()
+        
+        if not lines:
+            return 0
+        
+        if _log_file is None:
+            ensure_data_dir()
+            _log_file = open(ATTEMPTS_FILE, 'ab')
+        _log_file.write(b"".join(lines))
+        _log_file.flush()
+        # One fsync per batch - the log holds all history until compaction
+        os.fsync(_log_file.fileno())
+        return _log_file.tell()
+
+
+def close_log():
+    """
+    Close the kept-open attempts.jsonl handle (flush_log reopens it if needed).
+    """
+    global _log_file
+    
+    with get_lock(RUNS_LOCK):
+        if _log_file is not None:
+            _log_file.close()
+            _log_file = None
+
+
+def compact_runs():
+    """
+    Fold attempts.jsonl into runs.json and empty the log.
+    
+    Why: Called by the log writer thread once the log reaches
+    LOG_COMPACT_SIZE, so the log stays small and a cold load_runs() only
+    has to replay recent lines. runs.json is written from the in-memory
+    runs, which already include every logged run and attempt.
+    """
+    save_runs(load_runs())